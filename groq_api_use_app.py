@@ -1,32 +1,241 @@
-from flask import Flask, request, jsonify, send_file, url_for, make_response
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Blueprint, Response, current_app, request, jsonify, send_file, url_for, make_response
 import os
 import uuid
 import io
 import re
-from groq import Groq
+import zlib
+import threading
+import importlib.util
+import queue
+import logging
+import atexit
+import sqlite3
+import sys
+import mmap
+import struct
+import tempfile
+import contextlib
 from flask_caching import Cache
-from werkzeug.exceptions import BadRequest, NotFound, InternalServerError
+from werkzeug.exceptions import HTTPException, BadRequest, NotFound, InternalServerError, RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from docx import Document
 
-app = Flask(__name__)
+# Heavy subsystems are imported on first use: groq/httpx in get_client(), docx in create_srs_document()
+
+# Optional codecs for response compression; gzip is always available
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# Older brotli builds can't cap decompressed output, so br request bodies are refused there
+BROTLI_LIMITS_OUTPUT = brotli is not None and hasattr(brotli.Decompressor, 'can_accept_more_data')
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+bp = Blueprint('chatbot', __name__)
 
 # Set up caching
-app.config['CACHE_TYPE'] = 'simple'
-cache = Cache(app)
+cache = Cache()
 
 # Set up rate limiting
 limiter = Limiter(
     key_func=get_remote_address,
-    app=app,
     default_limits=["200 per day", "50 per hour"],
     storage_uri="memory://",
 )
 
+MAX_EXPORT_SIZE = 10 * 1024 * 1024  # 10 MB in bytes
+# Upper bound for a decompressed request body (export content plus JSON overhead)
+MAX_DECOMPRESSED_REQUEST_SIZE = MAX_EXPORT_SIZE + 64 * 1024
+
+# Warn when module import plus create_app() together take longer than this on worker boot
+STARTUP_TIME_BUDGET = float(os.environ.get('STARTUP_TIME_BUDGET', '0.5'))  # seconds
+
 # Set the Groq API key (use environment variables in production)
 GROQ_API_KEY = "Here I pase my groq website llama3.2 api"
-client = Groq(api_key=GROQ_API_KEY)
+
+# Upstream HTTP settings for the Groq client (override with environment variables,
+# e.g. point GROQ_BASE_URL at a local stand-in server for testing)
+GROQ_BASE_URL = os.environ.get('GROQ_BASE_URL', 'https://api.groq.com')
+GROQ_MAX_CONNECTIONS = int(os.environ.get('GROQ_MAX_CONNECTIONS', '20'))
+GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('GROQ_MAX_KEEPALIVE_CONNECTIONS', '10'))
+GROQ_KEEPALIVE_EXPIRY = float(os.environ.get('GROQ_KEEPALIVE_EXPIRY', '60'))  # seconds
+GROQ_CONNECT_TIMEOUT = float(os.environ.get('GROQ_CONNECT_TIMEOUT', '5'))  # seconds
+GROQ_CHAT_TIMEOUT = float(os.environ.get('GROQ_CHAT_TIMEOUT', '30'))  # seconds
+GROQ_SRS_TIMEOUT = float(os.environ.get('GROQ_SRS_TIMEOUT', '120'))  # seconds
+GROQ_MAX_RETRIES = int(os.environ.get('GROQ_MAX_RETRIES', '2'))
+GROQ_WARMUP = os.environ.get('GROQ_WARMUP', '0') == '1'
+GROQ_WARMUP_CONNECTIONS = int(os.environ.get('GROQ_WARMUP_CONNECTIONS', '2'))
+
+# Conversation storage: recent turns stay as plain strings, older ones are zlib-compressed,
+# sessions idle for SESSION_SPILL_AFTER seconds are moved to a temporary segment file, and
+# sessions idle for SESSION_EXPIRE_AFTER seconds are dropped
+HOT_TURNS = int(os.environ.get('HOT_TURNS', '8'))
+TURN_COMPRESS_MIN_SIZE = 512  # bytes; shorter turns aren't worth compressing
+SESSION_SPILL_AFTER = float(os.environ.get('SESSION_SPILL_AFTER', '600'))  # seconds
+SESSION_EXPIRE_AFTER = float(os.environ.get('SESSION_EXPIRE_AFTER', '86400'))  # seconds
+SPILL_COMPACT_MIN_SIZE = 1024 * 1024  # dead bytes tolerated in the segment file before compacting
+
+# Token usage ledger (append-only SQLite table, written in batches by a background thread)
+USAGE_DB_PATH = os.environ.get('USAGE_DB_PATH', 'usage_ledger.sqlite3')
+USAGE_BATCH_SIZE = int(os.environ.get('USAGE_BATCH_SIZE', '50'))
+USAGE_FLUSH_INTERVAL = float(os.environ.get('USAGE_FLUSH_INTERVAL', '2'))  # seconds
+USAGE_QUEUE_SIZE = int(os.environ.get('USAGE_QUEUE_SIZE', '10000'))  # records; newer ones are dropped when full
+
+http_client = None
+client = None
+_client_lock = threading.Lock()
+
+def request_timeout(seconds):
+    import httpx
+    return httpx.Timeout(seconds, connect=GROQ_CONNECT_TIMEOUT)
+
+def create_http_client():
+    import httpx
+    # HTTP/2 needs the optional h2 package; fall back to pooled HTTP/1.1 keep-alive
+    http2 = importlib.util.find_spec('h2') is not None
+    return httpx.Client(
+        base_url=GROQ_BASE_URL,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=GROQ_KEEPALIVE_EXPIRY,
+        ),
+        timeout=request_timeout(GROQ_CHAT_TIMEOUT),
+    )
+
+def get_client():
+    global http_client, client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from groq import Groq
+                http_client = create_http_client()
+                client = Groq(
+                    api_key=GROQ_API_KEY,
+                    base_url=GROQ_BASE_URL,
+                    max_retries=GROQ_MAX_RETRIES,
+                    timeout=request_timeout(GROQ_CHAT_TIMEOUT),
+                    http_client=http_client,
+                )
+    return client
+
+usage_queue = queue.Queue(maxsize=USAGE_QUEUE_SIZE)
+_usage_writer = None
+_usage_writer_lock = threading.Lock()
+
+def connect_usage_db():
+    conn = sqlite3.connect(USAGE_DB_PATH)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at REAL NOT NULL,
+            session_id TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            model TEXT,
+            prompt_tokens INTEGER NOT NULL,
+            completion_tokens INTEGER NOT NULL,
+            cached_tokens INTEGER NOT NULL,
+            latency_ms REAL NOT NULL
+        )
+    """)
+    conn.execute('CREATE INDEX IF NOT EXISTS usage_session ON usage (session_id)')
+    return conn
+
+def write_usage_batches():
+    logger = logging.getLogger(__name__)
+    conn = None
+    stopping = False
+    while not stopping:
+        batch = [usage_queue.get()]
+        deadline = time.monotonic() + USAGE_FLUSH_INTERVAL
+        while len(batch) < USAGE_BATCH_SIZE:
+            try:
+                batch.append(usage_queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        if None in batch:  # shutdown sentinel
+            stopping = True
+            batch = [row for row in batch if row is not None]
+        try:
+            # (Re)connect per batch so a bad path or read-only directory doesn't kill the writer;
+            # the batch is dropped and the next one tries again
+            if conn is None:
+                conn = connect_usage_db()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO usage (created_at, session_id, endpoint, model, prompt_tokens, '
+                    'completion_tokens, cached_tokens, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    batch,
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to write {len(batch)} usage records: {e}")
+    if conn is not None:
+        conn.close()
+
+def stop_usage_writer():
+    # Writes everything queued so far; record_usage() starts a new writer afterwards if needed
+    if _usage_writer is not None and _usage_writer.is_alive():
+        try:
+            usage_queue.put(None, timeout=5)
+        except queue.Full:
+            return
+        _usage_writer.join(timeout=5)
+
+atexit.register(stop_usage_writer)
+
+def record_usage(session_id, endpoint, response, latency):
+    global _usage_writer
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached_tokens = getattr(details, 'cached_tokens', None) or 0
+
+    if _usage_writer is None or not _usage_writer.is_alive():
+        with _usage_writer_lock:
+            if _usage_writer is None or not _usage_writer.is_alive():
+                _usage_writer = threading.Thread(target=write_usage_batches, daemon=True)
+                _usage_writer.start()
+    try:
+        usage_queue.put_nowait((
+            time.time(), session_id, endpoint, getattr(response, 'model', None),
+            usage.prompt_tokens or 0, usage.completion_tokens or 0, cached_tokens, latency * 1000,
+        ))
+    except queue.Full:
+        logging.getLogger(__name__).warning(f"Usage queue is full; dropped {endpoint} record for session {session_id}")
+
+def get_session_usage(session_id):
+    conn = connect_usage_db()
+    try:
+        rows = conn.execute("""
+            SELECT endpoint, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cached_tokens), SUM(latency_ms)
+            FROM usage WHERE session_id = ? GROUP BY endpoint
+        """, (session_id,)).fetchall()
+    finally:
+        conn.close()
+
+    endpoints = {
+        endpoint: {
+            'calls': calls,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_tokens': cached_tokens,
+            'latency_ms': round(latency_ms, 1),
+        }
+        for endpoint, calls, prompt_tokens, completion_tokens, cached_tokens, latency_ms in rows
+    }
+    totals = {key: sum(e[key] for e in endpoints.values())
+              for key in ('calls', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'latency_ms')}
+    return {'session_id': session_id, 'totals': totals, 'endpoints': endpoints}
 
 SYSTEM_MESSAGE_EN = """
 You are "KUROCO LAB chatbot", created by JB Connect Ltd. As a managing director and project implementor, your role is to:
@@ -52,52 +261,324 @@ SYSTEM_MESSAGE_JP = """
 常にプロフェッショナルでありながら親しみやすい口調を維持してください。明確化を求め、追加情報を提供することで、包括的なプロジェクト計画を確実にするよう積極的に行動してください。
 """
 
+# Prompt messages are built once and shared by every request
+SYSTEM_PROMPTS = {
+    'en': {"role": "system", "content": SYSTEM_MESSAGE_EN},
+    'jp': {"role": "system", "content": SYSTEM_MESSAGE_JP},
+}
+FORMAT_PROMPT = {"role": "system", "content": "Format your responses concisely, using Markdown. Use a single newline between paragraphs. Use **bold** for emphasis, - for unordered lists, 1. for ordered lists, and `code` for inline code or ```language for code blocks. Avoid unnecessary spacing."}
+
+# SRS section skeletons per template and language. The model fills in only the sections the
+# conversation covers, which keeps generated documents (and their token cost) to a predictable size.
+SRS_TEMPLATES = {
+    'ieee830': {
+        'max_tokens': 3000,
+        'sections': {
+            'en': (
+                "1. Introduction", "1.1. Purpose", "1.2. Scope", "1.3. Definitions, Acronyms and Abbreviations",
+                "1.4. References", "1.5. Overview",
+                "2. Overall Description", "2.1. Product Perspective", "2.2. Product Functions",
+                "2.3. User Characteristics", "2.4. Constraints", "2.5. Assumptions and Dependencies",
+                "3. Specific Requirements", "3.1. External Interface Requirements", "3.2. Functional Requirements",
+                "3.3. Performance Requirements", "3.4. Design Constraints", "3.5. Software System Attributes",
+                "3.6. Other Requirements",
+                "4. Project Plan", "4.1. Timeline", "4.2. Budget", "4.3. Risks", "4.4. Key Stakeholders",
+            ),
+            'jp': (
+                "1. はじめに", "1.1. 目的", "1.2. 範囲", "1.3. 用語・略語の定義", "1.4. 参考資料", "1.5. 概要",
+                "2. 全体説明", "2.1. 製品の位置付け", "2.2. 製品機能", "2.3. ユーザー特性", "2.4. 制約",
+                "2.5. 前提条件と依存関係",
+                "3. 詳細要件", "3.1. 外部インターフェース要件", "3.2. 機能要件", "3.3. 性能要件", "3.4. 設計制約",
+                "3.5. ソフトウェアシステム属性", "3.6. その他の要件",
+                "4. プロジェクト計画", "4.1. スケジュール", "4.2. 予算", "4.3. リスク", "4.4. 主要な利害関係者",
+            ),
+        },
+    },
+    'lite': {
+        'max_tokens': 1500,
+        'sections': {
+            'en': (
+                "1. Project Overview", "2. Goals and Scope", "3. Functional Requirements",
+                "4. Non-Functional Requirements", "5. Constraints and Assumptions", "6. Timeline and Budget",
+                "7. Risks and Open Questions",
+            ),
+            'jp': (
+                "1. プロジェクト概要", "2. 目標と範囲", "3. 機能要件", "4. 非機能要件", "5. 制約と前提条件",
+                "6. スケジュールと予算", "7. リスクと未解決事項",
+            ),
+        },
+    },
+}
+DEFAULT_SRS_TEMPLATE = os.environ.get('DEFAULT_SRS_TEMPLATE', 'ieee830')
+if DEFAULT_SRS_TEMPLATE not in SRS_TEMPLATES:
+    raise RuntimeError(f"DEFAULT_SRS_TEMPLATE must be one of {sorted(SRS_TEMPLATES)}, got {DEFAULT_SRS_TEMPLATE!r}")
+
+def compile_srs_prompts():
+    # Builds the fixed text before and after the conversation for every template/language pair
+    prompts = {}
+    for name, template in SRS_TEMPLATES.items():
+        for language, sections in template['sections'].items():
+            skeleton = "\n".join(sections)
+            language_rule = "\n6. Write the document in Japanese." if language == 'jp' else ""
+            prefix = f"""
+Based on the following conversation, write a Software Requirements Specification (SRS) document that follows the section skeleton below.
+
+1. Use the section headings exactly as written, in the same order, each on its own line without Markdown formatting.
+2. Do not add sections that are not in the skeleton.
+3. Fill in only the sections the conversation gives information for, and leave out the rest. Keep a parent heading only if at least one of its subsections is included.
+4. Use only details from the conversation; do not invent requirements.
+5. Keep each section concise: short paragraphs, with list items on lines starting with "- ".{language_rule}
+
+Section skeleton:
+{skeleton}
+
+Conversation History:
+"""
+            prompts[(name, language)] = (prefix, "\n\nGenerate the SRS document content:\n")
+    return prompts
+
+SRS_PROMPTS = compile_srs_prompts()
+
+def system_prompt(language):
+    return SYSTEM_PROMPTS['en' if language == 'en' else 'jp']
+
+ROLE_USER = sys.intern('user')
+ROLE_ASSISTANT = sys.intern('assistant')
+TRANSCRIPT_LABELS = {ROLE_USER: 'Human', ROLE_ASSISTANT: 'Assistant'}
+TURN_HEADER = struct.Struct('<BBI')  # role length, compressed flag, data length
+
+class Turn:
+    __slots__ = ('role', 'data', 'compressed')
+
+    def __init__(self, role, data, compressed=False):
+        self.role = sys.intern(role)
+        self.data = data
+        self.compressed = compressed
+
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8') if self.compressed else self.data
+
+    def compress(self):
+        if self.compressed:
+            return
+        raw = self.data.encode('utf-8')
+        if len(raw) >= TURN_COMPRESS_MIN_SIZE:
+            packed = zlib.compress(raw)
+            if len(packed) < len(raw):
+                self.data = packed
+                self.compressed = True
+
+class Conversation:
+    __slots__ = ('turns', 'lock', 'active', 'last_used', 'spill_offset', 'spill_length')
+
+    def __init__(self, turns=None):
+        self.turns = turns if turns is not None else []
+        self.lock = threading.Lock()  # guards turns while requests append and read them
+        self.active = 0  # requests currently using this conversation; active ones are never spilled
+        self.last_used = time.monotonic()
+        self.spill_offset = None
+        self.spill_length = None
+
+    @classmethod
+    def from_messages(cls, messages):
+        # Plain strings alternate user/assistant starting with the user; dicts carry their own role
+        conversation = cls()
+        for i, msg in enumerate(messages):
+            if isinstance(msg, dict):
+                conversation.append(msg['role'], msg['content'])
+            else:
+                conversation.append(ROLE_USER if i % 2 == 0 else ROLE_ASSISTANT, msg)
+        return conversation
+
+    def __len__(self):
+        return len(self.turns)
+
+    def append(self, role, text):
+        with self.lock:
+            self.turns.append(Turn(role, text))
+            if len(self.turns) > HOT_TURNS:
+                self.turns[-HOT_TURNS - 1].compress()
+
+    def messages(self, *prefix):
+        # Builds the request's message list in one pass, after the given prefix messages. A snapshot is
+        # taken under the lock; uncompressed turns share their string objects, compressed ones are
+        # decompressed on every call.
+        with self.lock:
+            return [*prefix, *({"role": turn.role, "content": turn.text} for turn in self.turns)]
+
+    def transcript(self):
+        with self.lock:
+            return [f"{TRANSCRIPT_LABELS.get(turn.role, turn.role.title())}: {turn.text}" for turn in self.turns]
+
+def pack_turns(turns):
+    parts = []
+    for turn in turns:
+        role = turn.role.encode('utf-8')
+        data = turn.data if turn.compressed else turn.data.encode('utf-8')
+        parts += [TURN_HEADER.pack(len(role), turn.compressed, len(data)), role, data]
+    return b''.join(parts)
+
+def unpack_turns(buf):
+    turns = []
+    pos = 0
+    while pos < len(buf):
+        role_length, compressed, data_length = TURN_HEADER.unpack_from(buf, pos)
+        pos += TURN_HEADER.size
+        role = bytes(buf[pos:pos + role_length]).decode('utf-8')
+        pos += role_length
+        data = bytes(buf[pos:pos + data_length])
+        pos += data_length
+        turns.append(Turn(role, data if compressed else data.decode('utf-8'), bool(compressed)))
+    return turns
+
 documents = {}
-conversation_history = []
+conversations = {}
 user_language = 'en'  # Default language
 
-def process_assistant_message(assistant_message, user_message):
+_conversation_lock = threading.Lock()
+_spill_file = None
+_spill_map = None
+_spilled_bytes = 0  # live bytes in the segment file
+_spill_file_size = 0
+_last_spill_sweep = time.monotonic()
+
+def spill_conversation(conversation):
+    global _spill_file, _spilled_bytes, _spill_file_size
+    data = pack_turns(conversation.turns)
+    if _spill_file is None:
+        _spill_file = tempfile.TemporaryFile(prefix='conversations-', suffix='.seg')
+    _spill_file.seek(_spill_file_size)
+    _spill_file.write(data)
+    _spill_file.flush()
+    conversation.spill_offset = _spill_file_size
+    conversation.spill_length = len(data)
+    conversation.turns = None
+    _spilled_bytes += len(data)
+    _spill_file_size += len(data)
+
+def release_spilled(conversation):
+    global _spilled_bytes
+    _spilled_bytes -= conversation.spill_length
+    conversation.spill_offset = conversation.spill_length = None
+
+def restore_conversation(conversation):
+    global _spill_map
+    end = conversation.spill_offset + conversation.spill_length
+    if _spill_map is None or len(_spill_map) < end:
+        if _spill_map is not None:
+            _spill_map.close()
+        _spill_map = mmap.mmap(_spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+    with memoryview(_spill_map)[conversation.spill_offset:end] as view:
+        conversation.turns = unpack_turns(view)
+    release_spilled(conversation)
+
+def compact_spill_file():
+    # Copy the live records into a fresh segment file and drop the records of restored or expired sessions
+    global _spill_file, _spill_map, _spill_file_size
+    if _spill_map is not None:
+        _spill_map.close()
+        _spill_map = None
+    new_file = tempfile.TemporaryFile(prefix='conversations-', suffix='.seg')
+    for conversation in conversations.values():
+        if conversation.spill_offset is not None:
+            _spill_file.seek(conversation.spill_offset)
+            data = _spill_file.read(conversation.spill_length)
+            conversation.spill_offset = new_file.tell()
+            new_file.write(data)
+    new_file.flush()
+    _spill_file.close()
+    _spill_file = new_file
+    _spill_file_size = new_file.tell()
+
+def sweep_conversations(now):
+    for session_id, conversation in list(conversations.items()):
+        if conversation.active:
+            continue
+        idle = now - conversation.last_used
+        if idle > SESSION_EXPIRE_AFTER:
+            del conversations[session_id]
+            if conversation.spill_offset is not None:
+                release_spilled(conversation)
+        elif conversation.turns and idle > SESSION_SPILL_AFTER:
+            spill_conversation(conversation)
+
+    dead_bytes = _spill_file_size - _spilled_bytes
+    if dead_bytes > max(_spilled_bytes, SPILL_COMPACT_MIN_SIZE) or (dead_bytes and not _spilled_bytes):
+        compact_spill_file()
+
+@contextlib.contextmanager
+def use_conversation(session_id):
+    # Keeps the conversation in memory for the whole request, including the LLM call
+    global _last_spill_sweep
+    with _conversation_lock:
+        now = time.monotonic()
+        if now - _last_spill_sweep > min(SESSION_SPILL_AFTER, SESSION_EXPIRE_AFTER) / 4:
+            _last_spill_sweep = now
+            sweep_conversations(now)
+
+        conversation = conversations.get(session_id)
+        if conversation is None:
+            conversation = conversations[session_id] = Conversation()
+        elif conversation.turns is None:
+            restore_conversation(conversation)
+        conversation.active += 1
+    try:
+        yield conversation
+    finally:
+        with _conversation_lock:
+            conversation.active -= 1
+            conversation.last_used = time.monotonic()
+
+def process_assistant_message(assistant_message, user_message, conversation, session_id='default', srs_template=None):
     global user_language
     if any(keyword in user_message.lower() for keyword in ["document", "report", "summary", "download", "link", "srs"]):
         doc_id = str(uuid.uuid4())
-        srs_content = generate_srs_content(conversation_history)
+        srs_content = generate_srs_content(conversation, session_id, template=srs_template)
         documents[doc_id] = srs_content
-        download_link = url_for('get_document', doc_id=doc_id, _external=True)
+        download_link = url_for('chatbot.get_document', doc_id=doc_id, _external=True)
         if user_language == 'en':
             assistant_message += f"\n\nI've prepared an SRS document based on our conversation. Here's the link to download your SRS document: [Download SRS Document]({download_link})"
         else:
             assistant_message += f"\n\n会話に基づいてSRSドキュメントを作成しました。以下のリンクからSRSドキュメントをダウンロードできます：[SRSドキュメントをダウンロード]({download_link})"
     return assistant_message
 
-def generate_srs_content(conversation_history):
-    conversation_text = "\n".join([f"{'Human' if i % 2 == 0 else 'Assistant'}: {msg}" for i, msg in enumerate(conversation_history)])
+def generate_srs_content(conversation_history, session_id='default', language=None, template=None):
+    language = language or user_language
+    template = template or DEFAULT_SRS_TEMPLATE
+    if template not in SRS_TEMPLATES:
+        raise ValueError(f"Unknown SRS template: {template}")
+    if not isinstance(conversation_history, Conversation):
+        conversation_history = Conversation.from_messages(conversation_history)
+    conversation_text = "\n".join(conversation_history.transcript())
     
-    srs_prompt = f"""
-    Based on the following conversation, generate a comprehensive Software Requirements Specification (SRS) document. The structure and content should be entirely based on the information discussed in the conversation. Follow these guidelines:
-
-    1. Start with an introduction that summarizes the project.
-    2. Create logical sections based on the topics discussed in the conversation.
-    3. Include all relevant details mentioned, such as project goals, scope, features, requirements, constraints, and any other important aspects.
-    4. Use appropriate headings and subheadings to organize the information.
-    5. If certain standard SRS sections are applicable but not explicitly discussed, include them with a note that they require further discussion.
-    6. Ensure the document flows logically and covers all aspects of the project mentioned in the conversation.
+    prefix, suffix = SRS_PROMPTS[(template, 'en' if language == 'en' else 'jp')]
+    srs_prompt = prefix + conversation_text + suffix
 
-    Conversation History:
-    {conversation_text}
-
-    Generate the SRS document content:
-    """
-
-    srs_response = client.chat.completions.create(
+    started = time.perf_counter()
+    srs_response = get_client().chat.completions.create(
         messages=[
-            {"role": "system", "content": SYSTEM_MESSAGE_EN if user_language == 'en' else SYSTEM_MESSAGE_JP},
+            system_prompt(language),
             {"role": "user", "content": srs_prompt}
         ],
         model="llama3-8b-8192",
+        max_tokens=SRS_TEMPLATES[template]['max_tokens'],
+        timeout=request_timeout(GROQ_SRS_TIMEOUT),
     )
-    return srs_response.choices[0].message.content
+    record_usage(session_id, 'srs', srs_response, time.perf_counter() - started)
+    choice = srs_response.choices[0]
+    if choice.finish_reason == 'length':
+        # The document is still usable, but the sections after the cut-off are missing
+        logging.getLogger(__name__).warning(
+            f"SRS for session {session_id} hit the {template} max_tokens limit "
+            f"({SRS_TEMPLATES[template]['max_tokens']}) and was truncated"
+        )
+    return choice.message.content
+
+HEADING_NUMBER = re.compile(r'(\d+(?:\.\d+)*)\.?\s')
 
 def create_srs_document(content):
+    from docx import Document
     doc = Document()
     doc.add_heading('Software Requirements Specification (SRS)', 0)
 
@@ -106,11 +587,18 @@ def create_srs_document(content):
     for line in lines:
         if line.strip():
             if line[0].isdigit() or line.isupper():
-                level = len(line.split('.')) if '.' in line else (1 if line.isupper() else 2)
+                # "1. Introduction" is level 1 and "1.1. Purpose" level 2; a trailing dot doesn't add a level
+                numbering = HEADING_NUMBER.match(line)
+                if numbering:
+                    level = len(numbering.group(1).split('.'))
+                else:
+                    level = 1 if line.isupper() else 2
                 doc.add_heading(line.strip(), level=level)
                 current_level = level
             else:
-                if line.startswith('  '):
+                if line.lstrip().startswith(('- ', '* ')):
+                    doc.add_paragraph(line.strip()[2:].strip(), style='List Bullet')
+                elif line.startswith('  '):
                     doc.add_paragraph(line.strip(), style='List Bullet')
                 else:
                     doc.add_paragraph(line.strip())
@@ -150,7 +638,151 @@ def process_response(response):
     
     return processed
 
-@app.route('/')
+def warm_up(logger):
+    import httpx
+    get_client()
+
+    # Open pooled upstream connections (TCP + TLS) before the first user request needs them.
+    # Each thread keeps its connection checked out until all have one, so none of them reuse
+    # a connection another thread just returned to the pool.
+    barrier = threading.Barrier(GROQ_WARMUP_CONNECTIONS, timeout=GROQ_CONNECT_TIMEOUT)
+
+    def open_connection():
+        try:
+            with http_client.stream('HEAD', '/', timeout=GROQ_CONNECT_TIMEOUT) as response:
+                response.read()  # an unread response would close the connection instead of pooling it
+                barrier.wait()
+        except httpx.HTTPError as e:
+            barrier.abort()
+            logger.warning(f"Groq connection warm-up failed: {e}")
+        except threading.BrokenBarrierError:
+            pass
+
+    threads = [threading.Thread(target=open_connection, daemon=True) for _ in range(GROQ_WARMUP_CONNECTIONS)]
+    for thread in threads:
+        thread.start()
+
+    # Load the default docx template so the first download doesn't pay for it
+    create_srs_document('')
+
+    for thread in threads:
+        thread.join()
+    logger.info(f"Warm-up finished ({GROQ_WARMUP_CONNECTIONS} connections to {GROQ_BASE_URL})")
+
+def supported_encodings():
+    # Preference order used when the client accepts several encodings equally
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+def negotiate_encoding():
+    return request.accept_encodings.best_match(supported_encodings())
+
+def compress_chunks(chunks, encoding, level):
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compress, flush = compressor.compress, compressor.flush
+    elif encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        compress, flush = compressor.process, compressor.finish
+    elif encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        compress, flush = compressor.compress, compressor.flush
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+def decompress_body(data, encoding, limit):
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(47)  # accept gzip and zlib headers
+        result = decompressor.decompress(data, limit + 1)
+        if not decompressor.eof and not decompressor.unconsumed_tail:
+            raise BadRequest("Truncated compressed request body")
+    elif encoding == 'br' and BROTLI_LIMITS_OUTPUT:
+        # Cap every process() call so a small body can't expand past the limit in one step
+        decompressor = brotli.Decompressor()
+        result = decompressor.process(data, output_buffer_limit=limit + 1)
+        while (len(result) <= limit and not decompressor.is_finished()
+               and not decompressor.can_accept_more_data()):
+            result += decompressor.process(b'', output_buffer_limit=limit + 1 - len(result))
+        if len(result) <= limit and not decompressor.is_finished():
+            raise BadRequest("Truncated compressed request body")
+    elif encoding == 'zstd' and zstandard is not None:
+        decompressor = zstandard.ZstdDecompressor()
+        with decompressor.stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+            result = reader.read(limit + 1)
+        # The reader stops quietly at a cut-off frame, so check that every frame is complete.
+        # This pass can't produce more than the bounded read above did.
+        if len(result) <= limit:
+            remaining = data
+            while remaining:
+                frame = decompressor.decompressobj()
+                frame.decompress(remaining)
+                if not frame.eof:
+                    raise BadRequest("Truncated compressed request body")
+                remaining = frame.unused_data
+    else:
+        raise BadRequest(f"Unsupported Content-Encoding: {encoding}")
+
+    if len(result) > limit:
+        raise RequestEntityTooLarge(f"Decompressed request body exceeds {limit / 1024 / 1024:.2f} MB")
+    return result
+
+@bp.before_app_request
+def decompress_request():
+    encoding = request.headers.get('Content-Encoding', '').strip().lower()
+    if not encoding or encoding == 'identity':
+        return
+    # Read the raw body before Flask wraps wsgi.input so the decoded body can replace it
+    data = get_input_stream(request.environ).read()
+    try:
+        body = decompress_body(data, encoding, MAX_DECOMPRESSED_REQUEST_SIZE)
+    except (zlib.error, ValueError) as e:
+        raise BadRequest(f"Invalid compressed request body: {e}")
+    except Exception as e:
+        if brotli is not None and isinstance(e, brotli.error):
+            raise BadRequest(f"Invalid compressed request body: {e}")
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise BadRequest(f"Invalid compressed request body: {e}")
+        raise
+
+    # Hand the decoded body to the rest of the request as if it had been sent uncompressed
+    request.environ['wsgi.input'] = io.BytesIO(body)
+    request.environ['CONTENT_LENGTH'] = str(len(body))
+    request.environ.pop('HTTP_CONTENT_ENCODING', None)
+    current_app.logger.debug(f"Decompressed {encoding} request body from {len(data)} to {len(body)} bytes")
+
+@bp.after_app_request
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    compressed = b''.join(compress_chunks([data], encoding, current_app.config['COMPRESS_LEVEL']))
+    current_app.logger.debug(f"Compressed {request.path} response with {encoding} from {len(data)} to {len(compressed)} bytes")
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@bp.route('/')
 def home():
     return """
     <!DOCTYPE html>
@@ -578,6 +1210,7 @@ def home():
         import json
 
         user_language = 'en'
+        session_id = '__SESSION_ID__'
 
         def on_complete(req):
             response = json.loads(req.text)
@@ -596,7 +1229,7 @@ def home():
             req.bind('complete', on_complete)
             req.open('POST', '/chat', True)
             req.set_header('content-type', 'application/json')
-            req.send(json.dumps({'message': user_input, 'language': user_language}))
+            req.send(json.dumps({'message': user_input, 'language': user_language, 'session_id': session_id}))
 
         def add_message(message, sender):
             chat_messages = document['chat-messages']
@@ -687,7 +1320,7 @@ def home():
         </script>
     </body>
     </html>
-    """
+    """.replace('__SESSION_ID__', uuid.uuid4().hex)  # crypto.randomUUID() needs HTTPS, so the server picks the id
 
 # @app.route('/chat', methods=['POST'])
 # @limiter.limit("5 per minute")
@@ -725,40 +1358,52 @@ def home():
 
 
 # Update the chat function to use the new process_response
-@app.route('/chat', methods=['POST'])
+@bp.route('/chat', methods=['POST'])
 @limiter.limit("5 per minute")
 def chat():
     global user_language
     try:
         user_message = request.json['message']
         user_language = request.json['language']
+        session_id = request.json.get('session_id') or 'default'
+        srs_template = request.json.get('srs_template') or DEFAULT_SRS_TEMPLATE
         if not user_message or not isinstance(user_message, str):
             raise BadRequest("Invalid message format")
+        if not isinstance(srs_template, str) or srs_template not in SRS_TEMPLATES:
+            raise BadRequest(f"Unknown SRS template: {srs_template}")
         
-        conversation_history.append(user_message)
-        
-        system_message = SYSTEM_MESSAGE_EN if user_language == 'en' else SYSTEM_MESSAGE_JP
-        
-        response = client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "system", "content": "Format your responses concisely, using Markdown. Use a single newline between paragraphs. Use **bold** for emphasis, - for unordered lists, 1. for ordered lists, and `code` for inline code or ```language for code blocks. Avoid unnecessary spacing."},
-                *[{"role": "user" if i % 2 == 0 else "assistant", "content": msg} for i, msg in enumerate(conversation_history)]
-            ],
-            model="llama3-8b-8192",
-        )
-        
-        response_content = response.choices[0].message.content
-        processed_response = process_response(response_content)
-        processed_response = process_assistant_message(processed_response, user_message)
-        conversation_history.append(processed_response)
+        with use_conversation(session_id) as conversation:
+            conversation.append(ROLE_USER, user_message)
+            
+            started = time.perf_counter()
+            response = get_client().chat.completions.create(
+                messages=conversation.messages(system_prompt(user_language), FORMAT_PROMPT),
+                model="llama3-8b-8192",
+                timeout=request_timeout(GROQ_CHAT_TIMEOUT),
+            )
+            record_usage(session_id, 'chat', response, time.perf_counter() - started)
+            
+            response_content = response.choices[0].message.content
+            processed_response = process_response(response_content)
+            processed_response = process_assistant_message(processed_response, user_message, conversation, session_id, srs_template)
+            conversation.append(ROLE_ASSISTANT, processed_response)
         
         return jsonify({'response': processed_response})
+    except HTTPException:
+        raise
     except Exception as e:
-        app.logger.error(f"An error occurred: {str(e)}")
+        current_app.logger.error(f"An error occurred: {str(e)}")
         raise InternalServerError("An unexpected error occurred")
 
-@app.route("/create_document/<doc_id>", methods=["GET"])
+@bp.route('/usage/<session_id>', methods=['GET'])
+def session_usage(session_id):
+    try:
+        return jsonify(get_session_usage(session_id))
+    except sqlite3.Error as e:
+        current_app.logger.error(f"An error occurred while reading usage: {e}")
+        raise InternalServerError("Failed to read usage")
+
+@bp.route("/create_document/<doc_id>", methods=["GET"])
 def get_document(doc_id):
     try:
         if doc_id not in documents:
@@ -775,36 +1420,79 @@ def get_document(doc_id):
             download_name='SRS_Document.docx'
         )
     except Exception as e:
-        app.logger.error(f"An error occurred while creating the document: {e}")
+        current_app.logger.error(f"An error occurred while creating the document: {e}")
         raise InternalServerError("Failed to create document")
 
-@app.route('/export-chat', methods=['POST'])
+@bp.route('/export-chat', methods=['POST'])
 def export_chat():
     try:
         chat_content = request.json['content']
         content_bytes = chat_content.encode('utf-8')
         
         # Check size (limit to 10 MB)
-        max_size = 10 * 1024 * 1024  # 10 MB in bytes
+        max_size = MAX_EXPORT_SIZE
         if len(content_bytes) > max_size:
             return jsonify({
                 'error': f"Chat export is too large ({len(content_bytes) / 1024 / 1024:.2f} MB). Maximum size is {max_size / 1024 / 1024} MB."
             }), 413  # 413 Payload Too Large
         
-        response = make_response(chat_content)
-        response.headers.set('Content-Type', 'text/html')
+        encoding = negotiate_encoding() if len(content_bytes) >= current_app.config['COMPRESS_MIN_SIZE'] else None
+        if encoding is None:
+            response = make_response(chat_content)
+        else:
+            # Stream the export through the compressor instead of buffering the compressed copy
+            chunk_size = current_app.config['COMPRESS_CHUNK_SIZE']
+            chunks = (content_bytes[i:i + chunk_size] for i in range(0, len(content_bytes), chunk_size))
+            response = Response(compress_chunks(chunks, encoding, current_app.config['COMPRESS_LEVEL']))
+            response.headers.set('Content-Encoding', encoding)
+            current_app.logger.debug(f"Streaming {len(content_bytes)} byte chat export with {encoding}")
+        response.vary.add('Accept-Encoding')
+        response.headers.set('Content-Type', 'text/html; charset=utf-8')
         response.headers.set('Content-Disposition', 'attachment', filename='chat_export.html')
         return response
 
     except Exception as e:
-        app.logger.error(f"An error occurred during chat export: {str(e)}")
+        current_app.logger.error(f"An error occurred during chat export: {str(e)}")
         raise InternalServerError("An unexpected error occurred during chat export")
 
-@app.errorhandler(BadRequest)
-@app.errorhandler(NotFound)
-@app.errorhandler(InternalServerError)
+@bp.app_errorhandler(BadRequest)
+@bp.app_errorhandler(NotFound)
+@bp.app_errorhandler(InternalServerError)
+@bp.app_errorhandler(RequestEntityTooLarge)
 def handle_error(error):
     return jsonify({'error': str(error)}), error.code
 
+def create_app():
+    started = time.perf_counter()
+    app = Flask(__name__)
+
+    # Set up caching
+    app.config['CACHE_TYPE'] = 'simple'
+    cache.init_app(app)
+
+    # Set up response compression (responses smaller than the threshold are sent as-is)
+    app.config['COMPRESS_MIN_SIZE'] = 1024  # bytes
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['COMPRESS_CHUNK_SIZE'] = 64 * 1024  # bytes per streamed export chunk
+
+    limiter.init_app(app)
+    app.register_blueprint(bp)
+
+    # Warm-up threads don't survive a fork, so with gunicorn --preload start them from a post_fork hook
+    if GROQ_WARMUP:
+        threading.Thread(target=warm_up, args=(app.logger,), daemon=True).start()
+
+    startup_time = IMPORT_TIME + (time.perf_counter() - started)
+    if startup_time > STARTUP_TIME_BUDGET:
+        app.logger.warning(f"Worker startup took {startup_time * 1000:.0f} ms (budget {STARTUP_TIME_BUDGET * 1000:.0f} ms)")
+    else:
+        app.logger.info(f"Worker startup took {startup_time * 1000:.0f} ms")
+    return app
+
+IMPORT_TIME = time.perf_counter() - _import_started
+
+# Serve with e.g. `gunicorn "groq_api_use_app:create_app()"`
+
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    app = create_app()
+    app.run(debug=True)
@@ -0,0 +1,164 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from groq_api_use_app import Conversation, SRS_TEMPLATES, DEFAULT_SRS_TEMPLATE, generate_srs_content, create_srs_document
+
+CHECKPOINT_NAME = '.srs_batch_checkpoint.jsonl'
+
+# Offline SRS generation for saved conversations, e.g.
+#   python srs_batch.py transcripts/ out/ --concurrency 4 --render-workers 2
+#   cat conversations.jsonl | python srs_batch.py - out/
+#
+# Each conversation is a JSON list of messages (user first, then alternating) or an object
+# {"id": ..., "language": "en"|"jp", "messages": [...]}. Messages may be strings or
+# {"role": ..., "content": ...} objects. Directories are scanned for *.json and *.jsonl files.
+# Records that can't be parsed are reported with their file and line, and make the exit code 1.
+
+def parse_conversation(record, default_id, default_language):
+    if isinstance(record, list):
+        record = {'messages': record}
+    messages = record.get('messages') or record.get('conversation_history') or []
+    conv_id = str(record.get('id', default_id))
+    return conv_id, record.get('language', default_language), Conversation.from_messages(messages)
+
+def parse_record(text, location, default_id, default_language):
+    # Returns (conversation id, language, conversation, None), or (location, None, None, error) for a bad record
+    try:
+        return parse_conversation(json.loads(text), default_id, default_language) + (None,)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return location, None, None, f"{type(e).__name__}: {e}"
+
+def read_jsonl(lines, path, name, default_language):
+    for line_no, line in enumerate(lines, 1):
+        if line.strip():
+            yield parse_record(line, f"{path}:{line_no}", f"{name}-{line_no}", default_language)
+
+def load_conversations(source, default_language):
+    if source == '-':
+        yield from read_jsonl(sys.stdin, '<stdin>', 'stdin', default_language)
+    elif os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            stem, ext = os.path.splitext(name)
+            if ext == '.json':
+                with open(path, encoding='utf-8') as f:
+                    yield parse_record(f.read(), path, stem, default_language)
+            elif ext == '.jsonl':
+                with open(path, encoding='utf-8') as f:
+                    yield from read_jsonl(f, path, stem, default_language)
+    else:
+        stem = os.path.splitext(os.path.basename(source))[0]
+        with open(source, encoding='utf-8') as f:
+            yield from read_jsonl(f, source, stem, default_language)
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {json.loads(line)['id'] for line in f if line.strip()}
+
+def render_document(content, out_path):
+    # Runs in a worker process; docx rendering is CPU-bound and holds the GIL
+    create_srs_document(content).save(out_path)
+    return out_path
+
+def safe_filename(conv_id):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in conv_id)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate SRS documents for saved conversations.")
+    parser.add_argument('source', help="directory of .json/.jsonl conversations, a .jsonl file, or - for stdin")
+    parser.add_argument('output_dir', help="directory for the generated .docx files and the checkpoint")
+    parser.add_argument('--concurrency', type=int, default=4, help="concurrent LLM requests (default: 4)")
+    parser.add_argument('--render-workers', type=int, default=os.cpu_count() or 1,
+                        help="processes used for docx rendering (default: CPU count)")
+    parser.add_argument('--language', choices=['en', 'jp'], default='en',
+                        help="language for conversations that don't specify one (default: en)")
+    parser.add_argument('--template', choices=sorted(SRS_TEMPLATES), default=DEFAULT_SRS_TEMPLATE,
+                        help=f"SRS section skeleton to fill in (default: {DEFAULT_SRS_TEMPLATE})")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and regenerate everything")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.output_dir, CHECKPOINT_NAME)
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    done = load_checkpoint(checkpoint_path)
+
+    pending = []
+    invalid = []
+    for conv_id, language, conversation, error in load_conversations(args.source, args.language):
+        if error is not None:
+            invalid.append((conv_id, error))
+        elif conv_id not in done:
+            pending.append((conv_id, language, conversation))
+    total = len(pending) + len(invalid)
+    print(f"{len(done)} already done, {len(pending)} to generate, {len(invalid)} invalid", file=sys.stderr)
+    if not total:
+        return 0
+
+    lock = threading.Lock()
+    progress = {'finished': 0, 'failed': 0}
+    started = time.perf_counter()
+
+    def report(conv_id, status):
+        with lock:
+            progress['finished'] += 1
+            elapsed = time.perf_counter() - started
+            print(f"[{progress['finished']}/{total}] {conv_id}: {status} ({elapsed:.1f}s elapsed)", file=sys.stderr)
+
+    def fail(conv_id, stage, error):
+        with lock:
+            progress['failed'] += 1
+        report(conv_id, f"{stage} failed: {error}")
+
+    # Bad records are reported and skipped; the rest of the archive is still generated
+    for location, error in invalid:
+        fail(location, 'parse', error)
+
+    # The pools shut down (waiting for render callbacks) before the checkpoint file is closed.
+    # Render workers are spawned rather than forked: by the time they start, the LLM threads,
+    # the usage-ledger writer and the HTTP pool are running, and a forked child could inherit a held lock.
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as llm_pool, \
+            ProcessPoolExecutor(max_workers=args.render_workers,
+                                mp_context=multiprocessing.get_context('spawn')) as render_pool:
+
+        def on_rendered(future, conv_id):
+            try:
+                out_path = future.result()
+            except Exception as e:
+                fail(conv_id, 'render', e)
+                return
+            # Only fully written documents are checkpointed, so an interrupted run resumes cleanly
+            with lock:
+                checkpoint.write(json.dumps({'id': conv_id, 'path': out_path}) + '\n')
+                checkpoint.flush()
+            report(conv_id, f"wrote {out_path}")
+
+        generate_futures = {
+            llm_pool.submit(generate_srs_content, conversation, f"batch:{conv_id}", language, args.template): conv_id
+            for conv_id, language, conversation in pending
+        }
+        for future in as_completed(generate_futures):
+            conv_id = generate_futures[future]
+            try:
+                content = future.result()
+            except Exception as e:
+                fail(conv_id, 'generation', e)
+                continue
+            out_path = os.path.join(args.output_dir, f"{safe_filename(conv_id)}.docx")
+            render_future = render_pool.submit(render_document, content, out_path)
+            render_future.add_done_callback(lambda f, conv_id=conv_id: on_rendered(f, conv_id))
+
+    print(f"Finished {total - progress['failed']}/{total} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return 1 if progress['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+import pytest
+
+import groq_api_use_app
+
+@pytest.fixture
+def app(monkeypatch):
+    # The limiter is shared by every app instance, so its counts would carry over between tests
+    monkeypatch.setattr(groq_api_use_app.limiter, 'enabled', False)
+    app = groq_api_use_app.create_app()
+    app.config['TESTING'] = True
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,112 @@
+import gzip
+import json
+import zlib
+
+import pytest
+
+import groq_api_use_app
+
+# A chat export the size the UI produces for a long conversation (about 1 MB of HTML)
+EXPORT_HTML = ''.join(
+    f'<div class="message bot-message"><p>Turn {i}: the project needs a <strong>mobile app</strong>, '
+    f'an admin dashboard and a reporting API.</p><ul><li>Budget: {i * 1000} USD</li></ul></div>'
+    for i in range(5000)
+)
+
+def test_export_is_streamed_gzip_and_smaller(client):
+    response = client.post('/export-chat', json={'content': EXPORT_HTML}, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.is_streamed
+
+    compressed = response.get_data()
+    original = EXPORT_HTML.encode('utf-8')
+    print(f"export: {len(original)} bytes uncompressed, {len(compressed)} bytes gzip")
+    assert gzip.decompress(compressed) == original
+    assert len(compressed) < len(original) / 10
+
+def test_export_uncompressed_without_accept_encoding(client):
+    response = client.post('/export-chat', json={'content': EXPORT_HTML}, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == EXPORT_HTML
+
+@pytest.mark.parametrize('encoding', ['br', 'zstd'])
+def test_export_with_optional_codecs(client, encoding):
+    if encoding not in groq_api_use_app.supported_encodings():
+        pytest.skip(f"{encoding} codec not installed")
+    if encoding == 'br':
+        decompress = groq_api_use_app.brotli.decompress
+    else:
+        decompress = groq_api_use_app.zstandard.ZstdDecompressor().decompressobj().decompress
+    response = client.post('/export-chat', json={'content': EXPORT_HTML}, headers={'Accept-Encoding': encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    compressed = response.get_data()
+    print(f"export: {len(EXPORT_HTML.encode('utf-8'))} bytes uncompressed, {len(compressed)} bytes {encoding}")
+    assert decompress(compressed).decode('utf-8') == EXPORT_HTML
+
+def test_small_responses_are_not_compressed(client):
+    response = client.post('/export-chat', json={'content': '<p>hi</p>'}, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == '<p>hi</p>'
+
+def test_home_page_is_compressed(client):
+    plain = client.get('/', headers={'Accept-Encoding': 'identity'}).get_data()
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    print(f"home page: {len(plain)} bytes uncompressed, {len(response.get_data())} bytes gzip")
+    assert len(response.get_data()) < len(plain)
+
+def test_gzip_request_body(client):
+    body = gzip.compress(json.dumps({'content': EXPORT_HTML}).encode('utf-8'))
+    response = client.post(
+        '/export-chat', data=body,
+        headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Accept-Encoding': 'identity'},
+    )
+    assert response.status_code == 200
+    assert response.get_data(as_text=True) == EXPORT_HTML
+
+def test_truncated_gzip_request_body(client):
+    body = gzip.compress(json.dumps({'content': EXPORT_HTML}).encode('utf-8'))
+    response = client.post(
+        '/export-chat', data=body[:len(body) // 2],
+        headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+    )
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br', 'zstd'])
+def test_decompression_bomb_is_rejected(encoding):
+    limit = 1024 * 1024
+    payload = b'\0' * (64 * 1024 * 1024)
+    if encoding == 'gzip':
+        body = zlib.compress(payload, 9)
+    elif encoding == 'br':
+        if not groq_api_use_app.BROTLI_LIMITS_OUTPUT:
+            pytest.skip("brotli without output limits")
+        body = groq_api_use_app.brotli.compress(payload, quality=5)
+    else:
+        zstandard = pytest.importorskip('zstandard')
+        body = zstandard.ZstdCompressor().compress(payload)
+
+    with pytest.raises(groq_api_use_app.RequestEntityTooLarge):
+        groq_api_use_app.decompress_body(body, encoding, limit)
+
+def test_truncated_zstd_is_rejected():
+    zstandard = pytest.importorskip('zstandard')
+    body = zstandard.ZstdCompressor().compress(EXPORT_HTML.encode('utf-8'))
+    with pytest.raises(groq_api_use_app.BadRequest):
+        groq_api_use_app.decompress_body(body[:len(body) // 2], 'zstd', len(EXPORT_HTML) * 2)
+
+def test_multi_frame_zstd_is_fully_decoded():
+    zstandard = pytest.importorskip('zstandard')
+    compressor = zstandard.ZstdCompressor()
+    first, second = b'first frame ' * 1000, b'second frame ' * 1000
+    body = compressor.compress(first) + compressor.compress(second)
+    assert groq_api_use_app.decompress_body(body, 'zstd', 10 ** 6) == first + second
+
+def test_truncated_brotli_is_rejected():
+    if not groq_api_use_app.BROTLI_LIMITS_OUTPUT:
+        pytest.skip("brotli without output limits")
+    body = groq_api_use_app.brotli.compress(EXPORT_HTML.encode('utf-8'))
+    with pytest.raises(groq_api_use_app.BadRequest):
+        groq_api_use_app.decompress_body(body[:len(body) // 2], 'br', len(EXPORT_HTML) * 2)
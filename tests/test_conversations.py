@@ -0,0 +1,123 @@
+import pytest
+
+import groq_api_use_app
+from groq_api_use_app import Conversation, pack_turns, unpack_turns, use_conversation
+
+LONG_TEXT = "The system must export monthly reports as PDF and CSV. " * 40
+JP_TEXT = "管理画面から月次レポートをPDFとCSVで出力できること。" * 40
+
+@pytest.fixture
+def store(monkeypatch):
+    # Fresh conversation store and segment file for each test
+    monkeypatch.setattr(groq_api_use_app, 'conversations', {})
+    monkeypatch.setattr(groq_api_use_app, '_spill_file', None)
+    monkeypatch.setattr(groq_api_use_app, '_spill_map', None)
+    monkeypatch.setattr(groq_api_use_app, '_spilled_bytes', 0)
+    monkeypatch.setattr(groq_api_use_app, '_spill_file_size', 0)
+    monkeypatch.setattr(groq_api_use_app, 'HOT_TURNS', 2)
+    monkeypatch.setattr(groq_api_use_app, 'SPILL_COMPACT_MIN_SIZE', 0)
+    return groq_api_use_app
+
+def fill(conversation):
+    for i, text in enumerate([LONG_TEXT, JP_TEXT, "short", LONG_TEXT + "!", JP_TEXT + "？"]):
+        conversation.append('user' if i % 2 == 0 else 'assistant', text)
+
+def expire_all(store, monkeypatch, spill_after, expire_after=3600):
+    monkeypatch.setattr(store, 'SESSION_SPILL_AFTER', spill_after)
+    monkeypatch.setattr(store, 'SESSION_EXPIRE_AFTER', expire_after)
+    for conversation in store.conversations.values():
+        conversation.last_used -= 1000
+    force_sweep(store, monkeypatch)
+
+def force_sweep(store, monkeypatch):
+    # The next use_conversation() call sweeps regardless of when the last sweep ran
+    monkeypatch.setattr(store, '_last_spill_sweep', float('-inf'))
+
+def test_old_turns_are_compressed(store):
+    conversation = Conversation()
+    fill(conversation)
+    assert [turn.compressed for turn in conversation.turns] == [True, True, False, False, False]
+    assert [m['content'] for m in conversation.messages()][:2] == [LONG_TEXT, JP_TEXT]
+
+def test_messages_follow_prefix_and_share_strings(store):
+    conversation = Conversation()
+    fill(conversation)
+    system = {"role": "system", "content": "You are a test"}
+    messages = conversation.messages(system)
+    assert messages[0] is system
+    assert [m['role'] for m in messages[1:]] == ['user', 'assistant', 'user', 'assistant', 'user']
+    # Hot turns hand over the stored string object itself
+    assert messages[-1]['content'] is conversation.turns[-1].data
+
+def test_pack_unpack_round_trip(store):
+    conversation = Conversation()
+    fill(conversation)
+    turns = unpack_turns(pack_turns(conversation.turns))
+    assert [(t.role, t.compressed, t.text) for t in turns] == [
+        (t.role, t.compressed, t.text) for t in conversation.turns
+    ]
+
+def test_from_messages_keeps_explicit_roles():
+    conversation = Conversation.from_messages(["hi", "hello", {"role": "assistant", "content": "again"}])
+    assert conversation.transcript() == ["Human: hi", "Assistant: hello", "Assistant: again"]
+
+def test_spill_and_restore(store, monkeypatch):
+    with use_conversation('a') as conversation:
+        fill(conversation)
+        expected = conversation.messages()
+
+    expire_all(store, monkeypatch, spill_after=10)
+    with use_conversation('b'):
+        pass
+    assert store.conversations['a'].turns is None
+    assert store._spilled_bytes > 0
+
+    with use_conversation('a') as conversation:
+        assert conversation.messages() == expected
+    assert store._spilled_bytes == 0
+
+def test_active_conversation_is_not_spilled(store, monkeypatch):
+    with use_conversation('a') as held:
+        held.append('user', LONG_TEXT)
+        expire_all(store, monkeypatch, spill_after=10)
+        with use_conversation('b'):
+            pass
+        held.append('assistant', 'still here')
+        assert len(held.messages()) == 2
+
+def test_abandoned_sessions_expire(store, monkeypatch):
+    for session_id in ('a', 'b'):
+        with use_conversation(session_id) as conversation:
+            fill(conversation)
+    expire_all(store, monkeypatch, spill_after=10)
+    with use_conversation('c'):
+        pass
+    assert store._spilled_bytes > 0
+
+    expire_all(store, monkeypatch, spill_after=10, expire_after=100)
+    with use_conversation('d'):
+        pass
+    assert set(store.conversations) == {'d'}
+    assert store._spilled_bytes == 0
+    assert store._spill_file_size == 0
+
+def test_segment_file_is_compacted(store, monkeypatch):
+    for session_id in ('a', 'b', 'c'):
+        with use_conversation(session_id) as conversation:
+            fill(conversation)
+    expire_all(store, monkeypatch, spill_after=10)
+    with use_conversation('x'):
+        pass
+    full_size = store._spill_file_size
+
+    # Restoring two sessions leaves their records dead; the next sweep drops them from the file
+    for session_id in ('a', 'b'):
+        with use_conversation(session_id):
+            pass
+    force_sweep(store, monkeypatch)
+    with use_conversation('x'):
+        pass
+    assert store._spill_file_size == store._spilled_bytes < full_size
+
+    with use_conversation('c') as conversation:
+        assert conversation.messages()[0]['content'] == LONG_TEXT
@@ -0,0 +1,113 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import groq_api_use_app
+
+class StandInServer(ThreadingHTTPServer):
+    # Counts TCP connections so tests can check that the client pool reuses them
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.connections = 0
+        self.requests = []
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.server.requests.append(('HEAD', self.path))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(('POST', self.path))
+        payload = json.dumps({
+            'id': 'chatcmpl-test',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': body['model'],
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': 'Tell me more about the project.'},
+            }],
+            'usage': {'prompt_tokens': 12, 'completion_tokens': 7, 'total_tokens': 19},
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+@pytest.fixture
+def stand_in(monkeypatch, tmp_path):
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(groq_api_use_app, 'GROQ_BASE_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    # A running writer keeps its connection, so stop it before pointing the ledger at a new file
+    groq_api_use_app.stop_usage_writer()
+    monkeypatch.setattr(groq_api_use_app, 'USAGE_DB_PATH', str(tmp_path / 'usage.sqlite3'))
+    # Build a fresh client pointed at the stand-in
+    monkeypatch.setattr(groq_api_use_app, 'client', None)
+    monkeypatch.setattr(groq_api_use_app, 'http_client', None)
+    yield server
+    groq_api_use_app.stop_usage_writer()
+    if groq_api_use_app.http_client is not None:
+        groq_api_use_app.http_client.close()
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize('connections', [1, 3])
+def test_warm_up_opens_pooled_connections(app, stand_in, monkeypatch, connections):
+    monkeypatch.setattr(groq_api_use_app, 'GROQ_WARMUP_CONNECTIONS', connections)
+    groq_api_use_app.warm_up(app.logger)
+
+    assert stand_in.connections == connections
+    assert stand_in.requests == [('HEAD', '/')] * connections
+
+def test_chat_reuses_warmed_connection(app, client, stand_in, monkeypatch):
+    monkeypatch.setattr(groq_api_use_app, 'GROQ_WARMUP_CONNECTIONS', 2)
+    groq_api_use_app.warm_up(app.logger)
+
+    response = client.post('/chat', json={'message': 'I want to build an app', 'language': 'en', 'session_id': 'pool'})
+    assert response.status_code == 200
+    assert response.json['response'] == 'Tell me more about the project.'
+    assert ('POST', '/openai/v1/chat/completions') in stand_in.requests
+    assert stand_in.connections == 2
+
+def test_usage_ledger_totals(client, stand_in):
+    # "srs" in the message also triggers SRS generation, so both endpoints are recorded
+    response = client.post('/chat', json={'message': 'Please make the SRS', 'language': 'en', 'session_id': 'ledger'})
+    assert response.status_code == 200
+    groq_api_use_app.stop_usage_writer()
+
+    usage = client.get('/usage/ledger').json
+    per_call = {'calls': 1, 'prompt_tokens': 12, 'completion_tokens': 7, 'cached_tokens': 0}
+    assert {endpoint: {key: stats[key] for key in per_call} for endpoint, stats in usage['endpoints'].items()} == {
+        'chat': per_call, 'srs': per_call,
+    }
+    assert usage['totals']['calls'] == 2
+    assert usage['totals']['prompt_tokens'] == 24
+    assert usage['totals']['completion_tokens'] == 14
+    assert usage['totals']['latency_ms'] > 0
+
+def test_usage_for_unknown_session(client, stand_in):
+    assert client.get('/usage/nobody').json == {
+        'session_id': 'nobody',
+        'totals': {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'latency_ms': 0},
+        'endpoints': {},
+    }
@@ -0,0 +1,97 @@
+import io
+import json
+import os
+
+import pytest
+
+import srs_batch
+
+@pytest.fixture
+def generated(monkeypatch):
+    # Stands in for the LLM; records which conversations were generated
+    calls = []
+
+    def fake_generate(conversation, session_id, language, template):
+        calls.append(session_id)
+        if 'boom' in ' '.join(conversation.transcript()):
+            raise RuntimeError("upstream error")
+        return "1. Introduction\n- generated"
+
+    monkeypatch.setattr(srs_batch, 'generate_srs_content', fake_generate)
+    return calls
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def checkpoint_ids(output_dir):
+    with open(os.path.join(output_dir, srs_batch.CHECKPOINT_NAME), encoding='utf-8') as f:
+        return sorted(json.loads(line)['id'] for line in f)
+
+def run(source, output_dir, *args):
+    return srs_batch.main([str(source), str(output_dir), '--render-workers', '1', *args])
+
+def test_load_directory(tmp_path):
+    write(tmp_path / 'a.json', json.dumps(["I need an app", "What platforms?"]))
+    write(tmp_path / 'b.jsonl', '\n'.join([
+        json.dumps({'id': 'shop', 'language': 'jp', 'messages': [{'role': 'user', 'content': 'ECサイト'}]}),
+        '',
+        json.dumps(["hello"]),
+    ]))
+    write(tmp_path / 'notes.txt', 'ignored')
+
+    loaded = list(srs_batch.load_conversations(str(tmp_path), 'en'))
+    assert [(conv_id, language, error) for conv_id, language, _, error in loaded] == [
+        ('a', 'en', None), ('shop', 'jp', None), ('b-3', 'en', None),
+    ]
+    assert loaded[0][2].transcript() == ["Human: I need an app", "Assistant: What platforms?"]
+    assert loaded[1][2].transcript() == ["Human: ECサイト"]
+
+def test_load_stdin(monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO(json.dumps({'id': 'x', 'messages': ['hi']}) + '\n'))
+    [(conv_id, language, conversation, error)] = srs_batch.load_conversations('-', 'jp')
+    assert (conv_id, language, error) == ('x', 'jp', None)
+    assert conversation.transcript() == ["Human: hi"]
+
+def test_bad_records_are_reported_and_skipped(tmp_path, generated, capsys):
+    source = tmp_path / 'archive.jsonl'
+    write(source, json.dumps({'id': 'good', 'messages': ['hi']}) + '\n{not json\n')
+
+    assert run(source, tmp_path / 'out') == 1
+    assert checkpoint_ids(tmp_path / 'out') == ['good']
+    assert os.path.exists(tmp_path / 'out' / 'good.docx')
+    assert f"{source}:2: parse failed: JSONDecodeError" in capsys.readouterr().err
+
+def test_resume_and_restart(tmp_path, generated):
+    source = tmp_path / 'archive.jsonl'
+    write(source, '\n'.join(json.dumps({'id': i, 'messages': ['hi']}) for i in ('a', 'b')))
+    output_dir = tmp_path / 'out'
+
+    assert run(source, output_dir) == 0
+    assert sorted(generated) == ['batch:a', 'batch:b']
+    assert checkpoint_ids(output_dir) == ['a', 'b']
+
+    generated.clear()
+    assert run(source, output_dir) == 0
+    assert generated == []
+
+    assert run(source, output_dir, '--restart') == 0
+    assert sorted(generated) == ['batch:a', 'batch:b']
+    assert checkpoint_ids(output_dir) == ['a', 'b']
+
+def test_generation_failure(tmp_path, generated):
+    source = tmp_path / 'archive.jsonl'
+    write(source, '\n'.join([
+        json.dumps({'id': 'ok', 'messages': ['hi']}),
+        json.dumps({'id': 'bad', 'messages': ['boom']}),
+    ]))
+    output_dir = tmp_path / 'out'
+
+    assert run(source, output_dir) == 1
+    assert checkpoint_ids(output_dir) == ['ok']
+    assert not os.path.exists(output_dir / 'bad.docx')
+
+    # A rerun only retries the failed conversation
+    generated.clear()
+    assert run(source, output_dir) == 1
+    assert generated == ['batch:bad']
@@ -0,0 +1,59 @@
+import logging
+import types
+
+import pytest
+
+import groq_api_use_app
+from groq_api_use_app import SRS_PROMPTS, SRS_TEMPLATES, compile_srs_prompts, create_srs_document, generate_srs_content
+
+def test_prompts_compiled_for_every_template_and_language():
+    prompts = compile_srs_prompts()
+    assert set(prompts) == {('ieee830', 'en'), ('ieee830', 'jp'), ('lite', 'en'), ('lite', 'jp')}
+    for (template, language), (prefix, suffix) in prompts.items():
+        for section in SRS_TEMPLATES[template]['sections'][language]:
+            assert f"\n{section}\n" in prefix
+        assert ("Write the document in Japanese." in prefix) == (language == 'jp')
+        assert prefix.endswith("Conversation History:\n")
+        assert "Generate the SRS document content" in suffix
+
+@pytest.mark.parametrize('srs_template', ['nope', 5, ['lite']])
+def test_chat_rejects_unknown_template(client, srs_template):
+    response = client.post('/chat', json={'message': 'hi', 'language': 'en', 'srs_template': srs_template})
+    assert response.status_code == 400
+    assert 'Unknown SRS template' in response.json['error']
+
+def test_document_heading_levels_and_bullets():
+    doc = create_srs_document("1. Introduction\n- first item\n1.1. Purpose\nPlain text\n2. Overall Description")
+    assert [(p.style.name, p.text) for p in doc.paragraphs[1:]] == [
+        ('Heading 1', '1. Introduction'),
+        ('List Bullet', 'first item'),
+        ('Heading 2', '1.1. Purpose'),
+        ('Normal', 'Plain text'),
+        ('Heading 1', '2. Overall Description'),
+    ]
+
+class FakeClient:
+    # Returns a canned completion and remembers the request it was given
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+        self.request = None
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        self.request = kwargs
+        message = types.SimpleNamespace(content="1. Introduction")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason=self.finish_reason)])
+
+@pytest.mark.parametrize('finish_reason, warned', [('length', True), ('stop', False)])
+def test_truncated_generation_is_logged(monkeypatch, caplog, finish_reason, warned):
+    fake = FakeClient(finish_reason)
+    monkeypatch.setattr(groq_api_use_app, 'get_client', lambda: fake)
+
+    with caplog.at_level(logging.WARNING, logger='groq_api_use_app'):
+        content = generate_srs_content(["I need a shop"], 'templates', 'jp', 'lite')
+
+    assert content == "1. Introduction"
+    assert fake.request['max_tokens'] == SRS_TEMPLATES['lite']['max_tokens']
+    prefix, suffix = SRS_PROMPTS[('lite', 'jp')]
+    assert fake.request['messages'][1]['content'] == prefix + "Human: I need a shop" + suffix
+    assert ('truncated' in caplog.text) == warned
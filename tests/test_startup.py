@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so nothing imported by other tests is already cached
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import groq_api_use_app
+imported = time.perf_counter()
+groq_api_use_app.create_app()
+print(json.dumps({
+    'import_time': imported - started,
+    'startup_time': time.perf_counter() - started,
+    'budget': groq_api_use_app.STARTUP_TIME_BUDGET,
+    'heavy_modules': [name for name in ('docx', 'groq', 'httpx') if name in sys.modules],
+}))
+"""
+
+def run_startup():
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        cwd=ROOT, capture_output=True, text=True, check=True, timeout=60,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_heavy_subsystems_are_not_imported_at_startup():
+    stats = run_startup()
+    assert stats['heavy_modules'] == []
+
+# Wall-clock time varies on shared CI machines, so by default only a gross regression fails.
+# Set STARTUP_BENCHMARK=1 to hold startup to STARTUP_TIME_BUDGET itself.
+STRICT_BUDGET = os.environ.get('STARTUP_BENCHMARK') == '1'
+BUDGET_SLACK = 1 if STRICT_BUDGET else 4
+
+def test_startup_within_budget():
+    # Best of three to keep disk-cache warm-up out of the measurement
+    runs = [run_startup() for _ in range(3)]
+    best = min(runs, key=lambda stats: stats['startup_time'])
+    print(f"import {best['import_time'] * 1000:.0f} ms, import + create_app {best['startup_time'] * 1000:.0f} ms "
+          f"(budget {best['budget'] * 1000:.0f} ms)")
+    assert best['startup_time'] < best['budget'] * BUDGET_SLACK